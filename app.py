@@ -1,13 +1,20 @@
-import math
+import io
+import os
+import tempfile
 import uuid
 from datetime import datetime, timedelta
+from functools import lru_cache
+from pathlib import Path
 from typing import Any, Union
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
 import pytz
-from bson.json_util import dumps
-from fastapi import FastAPI, Response
-from fastapi.responses import JSONResponse
+from fastapi import BackgroundTasks, FastAPI, Response
+from fastapi.responses import FileResponse, JSONResponse
+from joblib import Parallel, delayed
 from pydantic import BaseModel
 from pymongo import ASCENDING, MongoClient
 
@@ -17,112 +24,171 @@ store_status_coll = db["store_status"]
 timezone_coll = db["restaurant_tz"]
 menu_hours_coll = db["menu_hours"]
 reports_coll = db["reports"]
+# Next to this file, so it does not depend on the server's working directory.
+reports_dir = Path(__file__).resolve().parent / "reports"
+# A "running" sentinel older than this is treated as a crashed run and reclaimed.
+report_timeout = timedelta(hours=1)
 
 
-def utc_to_local(utc_time_str: str, timezone_str: str) -> str:
-    utc_time = datetime.strptime(utc_time_str, "%Y-%m-%d %H:%M:%S.%f UTC")
-    local_tz = pytz.timezone(timezone_str)
-    local_time = utc_time.replace(tzinfo=pytz.utc).astimezone(local_tz)
-    return local_time.strftime("%Y-%m-%d %H:%M:%S.%f")
-
-
-def get_timezone_using_store_id(store_id: str) -> str:
-    result = timezone_coll.find_one({"store_id": store_id})
-    return result["timezone_str"] if result else "America/Chicago"
+@lru_cache(maxsize=512)
+def _tz(name: str):
+    return pytz.timezone(name)
 
 
 def get_unique_store_ids_from_poll() -> list[str]:
     return store_status_coll.distinct("store_id")
 
 
-def get_poll_data_of_store(store_id: str):
-    tz: str = get_timezone_using_store_id(store_id)
+def get_timezones_of_all_stores() -> dict[str, str]:
+    # Stores missing from this map fall back to "America/Chicago".
+    return {
+        doc["store_id"]: doc["timezone_str"]
+        for doc in timezone_coll.find(
+            {}, projection={"_id": False, "store_id": True, "timezone_str": True}
+        ).batch_size(10_000)
+    }
 
-    result = store_status_coll.find(
-        {"store_id": store_id},
-        projection={"_id": False, "timestamp_utc": True, "status": True},
-    )
-    result.sort([("timestamp_utc", ASCENDING)])
-    data = {"0": [], "1": [], "2": [], "3": [], "4": [], "5": [], "6": []}
-    for doc in result:
-        if (
-            datetime.strptime(doc["timestamp_utc"], "%Y-%m-%d %H:%M:%S.%f UTC")
-            > datetime.now()
-        ):
-            continue
-        local_time = utc_to_local(doc["timestamp_utc"], tz)
-        # if is_within_current_week(local_time):
-        data[
-            str(datetime.strptime(local_time, "%Y-%m-%d %H:%M:%S.%f").weekday())
-        ].append(
+
+def get_poll_data_of_all_stores() -> dict[str, list]:
+    now_utc: str = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S.%f UTC")
+    poll_data: dict[str, list] = {}
+
+    # Already sorted by store and time, so each store's list stays in order.
+    # Status is encoded server side as 1 for active and 0 otherwise.
+    for doc in store_status_coll.aggregate(
+        [
+            {"$match": {"timestamp_utc": {"$lte": now_utc}}},
+            {"$sort": {"store_id": ASCENDING, "timestamp_utc": ASCENDING}},
             {
-                "timestamp_local": datetime.strptime(
-                    local_time, "%Y-%m-%d %H:%M:%S.%f"
-                ).strftime("%H:%M:%S"),
-                "status": 1 if doc["status"] == "active" else 0,
-            }
-        )
-    return data
+                "$project": {
+                    "_id": False,
+                    "store_id": True,
+                    "timestamp_utc": True,
+                    "status": {"$cond": [{"$eq": ["$status", "active"]}, 1, 0]},
+                }
+            },
+        ],
+        allowDiskUse=True,
+        batchSize=10_000,
+    ):
+        poll_data.setdefault(doc["store_id"], []).append(doc)
+    return poll_data
+
 
+def get_poll_data_of_store(store_poll_docs: list[dict], tz: str) -> pd.DataFrame:
+    df = pd.DataFrame(store_poll_docs, columns=["timestamp_utc", "status"])
 
-def filter_status_by_business_hours(day_status, day_business_hours):
+    timestamp_utc = pd.to_datetime(
+        df["timestamp_utc"], format="%Y-%m-%d %H:%M:%S.%f UTC", cache=True, utc=True
+    )
+    local_time = timestamp_utc.dt.tz_convert(_tz(tz)).dt.tz_localize(None)
+    # if is_within_current_week(local_time):
+    return pd.DataFrame(
+        {
+            "weekday": local_time.dt.weekday,
+            # Only the time of day matters, so every poll is put on the same date.
+            "timestamp_local": local_time - local_time.dt.normalize() + pd.Timestamp(0),
+            "status": df["status"].astype(np.int8),
+        }
+    ).set_index("timestamp_local")
+
+
+@lru_cache(maxsize=100_000)
+def _hhmmss_to_int(hhmmss: str) -> int:
+    # Seconds since midnight for a "HH:MM:SS" string. Business hours repeat
+    # across days and stores, so each distinct string is parsed once.
+    hours, minutes, seconds = hhmmss.split(":")
+    return int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+
+
+@lru_cache(maxsize=4096)
+def _business_hours_bounds(
+    windows: tuple[tuple[str, str], ...]
+) -> tuple[np.ndarray, np.ndarray]:
+    # Window starts in seconds since midnight, sorted, paired with the latest
+    # end of any window starting at or before each of them. A time t is open
+    # when the last start <= t has a reach >= t. Windows ending before they
+    # start never reach past their own start, so they match nothing as before.
+    bounds = sorted(
+        (_hhmmss_to_int(start_time_local), _hhmmss_to_int(end_time_local))
+        for start_time_local, end_time_local in windows
+    )
+    starts = np.array([start for start, _ in bounds], dtype=np.int32)
+    reach = np.maximum.accumulate(np.array([end for _, end in bounds], dtype=np.int32))
+    starts.flags.writeable = False
+    reach.flags.writeable = False
+    return starts, reach
+
+
+def filter_status_by_business_hours(
+    store_status: pd.DataFrame, business_hours
+) -> pd.DataFrame:
     """
-    Filters the list of status entries for a particular day based on the business hours.
+    Filters the status entries of a store based on the business hours of their weekday.
 
     Args:
-        day_status (list[dict]): A list of status entries for the day, each containing the timestamp_local and status keys.
-        day_business_hours (list[dict]): A list of business hours for the day, each containing the start_time_local and end_time_local keys.
+        store_status (pd.DataFrame): The status entries of the store, indexed by timestamp_local with weekday and status columns.
+        business_hours (dict): A dictionary of business hours with keys 0-6, each a list containing the start_time_local and end_time_local keys.
 
     Returns:
-        list[dict]: A list of status entries that fall within the business hours.
+        pd.DataFrame: The status entries that fall within the business hours.
     """
-    filtered_status = []
-    for entry in day_status:
-        timestamp = datetime.strptime(entry["timestamp_local"], "%H:%M:%S").time()
-        for hours in day_business_hours:
-            start_time = datetime.strptime(hours["start_time_local"], "%H:%M:%S").time()
-            end_time = datetime.strptime(hours["end_time_local"], "%H:%M:%S").time()
-            if start_time <= timestamp <= end_time:
-                filtered_status.append(entry)
-                break
-    return filtered_status
-
-
-def downsampled_data(data):
+    if store_status.empty:
+        return store_status
+
+    index = store_status.index
+    timestamps = (index.hour * 3600 + index.minute * 60 + index.second).to_numpy()
+    weekdays = store_status["weekday"].to_numpy()
+    within_hours = np.zeros(len(store_status), dtype=bool)
+    for day, day_business_hours in business_hours.items():
+        starts, reach = _business_hours_bounds(
+            tuple(
+                (hours["start_time_local"], hours["end_time_local"])
+                for hours in day_business_hours
+            )
+        )
+        on_day = weekdays == int(day)
+        day_timestamps = timestamps[on_day]
+        last_start = np.searchsorted(starts, day_timestamps, side="right") - 1
+        within_hours[on_day] = (last_start >= 0) & (
+            day_timestamps <= reach[np.maximum(last_start, 0)]
+        )
+    return store_status[within_hours]
+
+
+def downsampled_data(data: pd.DataFrame) -> np.ndarray:
     """
     Downsamples time-series data to hourly intervals.
 
     Args:
-        data: A list of dictionaries representing time-series data. Each dictionary
-            should have the keys "timestamp_local" (a string representing a local
-            timestamp in the format "HH:MM:SS") and "status" (a float representing a
-            status value).
+        data: A DataFrame of time-series data indexed by "timestamp_local" (the
+            local time of day) with a "weekday" column (0-6) and a "status"
+            column (1 for active, 0 otherwise).
 
     Returns:
-        A list of dictionaries representing the downsampled time-series data. Each
-        dictionary has the keys "timestamp_local" (a string representing a local
-        timestamp in the format "HH:MM:SS") and "status" (a string representing the
-        mean status value for the corresponding hourly interval).
+        An array of shape (7, 24) indexed by weekday and hour of day, holding the
+        mean status value for that hour, or NaN for hours without any polls.
     """
 
-    df = pd.DataFrame(data)
-    if not data:
-        return df
+    # Every (weekday, hour) pair gets its own slot, so one pass fills the week.
+    slots = data["weekday"].to_numpy() * 24 + data.index.hour.to_numpy()
+    counts = np.bincount(slots, minlength=7 * 24)
+    sums = np.bincount(slots, weights=data["status"].to_numpy(), minlength=7 * 24)
+    hourly = np.divide(sums, counts, out=np.full(7 * 24, np.nan), where=counts > 0)
+    return hourly.reshape(7, 24)
+
 
-    df["timestamp_local"] = pd.to_datetime(df["timestamp_local"])
-    df.set_index("timestamp_local", inplace=True)
-    downsampled = df.resample("60T").mean()
-    downsampled_data = [
-        {"timestamp_local": ts.time().strftime("%H:%M:%S"), "status": status}
-        for ts, status in zip(downsampled.index, downsampled["status"])
-    ]
-    return downsampled_data
+def get_business_hours_of_all_stores() -> dict[str, list]:
+    menu_hours: dict[str, list] = {}
+    for rec in menu_hours_coll.find({}, projection={"_id": False}).batch_size(10_000):
+        menu_hours.setdefault(rec["store_id"], []).append(rec)
+    return menu_hours
 
 
-def get_business_hours_of_store(store_id):
+def get_business_hours_of_store(store_menu_hours: list[dict]):
     business_hours = {"0": [], "1": [], "2": [], "3": [], "4": [], "5": [], "6": []}
 
-    for rec in menu_hours_coll.find({"store_id": store_id}):
+    for rec in store_menu_hours:
         business_hours[rec["day"]].append(
             {
                 "start_time_local": rec["start_time_local"],
@@ -143,55 +209,38 @@ def get_business_hours_of_store(store_id):
     return business_hours
 
 
-def get_store_poll_data_per_day(store_poll_data, business_hours) -> dict[str, list]:
+def get_store_poll_data_per_day(store_poll_data, business_hours) -> np.ndarray:
     """
-    Given a dictionary of store poll data and a dictionary of business hours, returns a dictionary
-    of downsampled and filtered store poll data, with one key-value pair for each day of the week.
+    Given the store poll data and a dictionary of business hours, returns the downsampled and
+    filtered store poll data, with one row for each day of the week.
 
     Parameters:
-    - store_poll_data (dict): A dictionary of store poll data, with keys 0-6 representing days of the week,
-    and values being lists of dictionaries with keys "timestamp_local" (a string representing the local timestamp)
-    and "status" (a string representing the store's status).
+    - store_poll_data (pd.DataFrame): The store poll data, indexed by "timestamp_local" (the local time of day)
+    with "weekday" (0-6) and "status" columns.
     - business_hours (dict): A dictionary of business hours, with keys 0-6 representing days of the week,
     and values being lists of dictionaries with keys "start_time_local" (a string representing the local start time)
     and "end_time_local" (a string representing the local end time).
 
     Returns:
-    - store_poll_data_per_day (dict): A dictionary of downsampled and filtered store poll data, with keys 0-6
-    representing days of the week, and values being lists of dictionaries with keys "timestamp_local"
-    (a string representing the local timestamp) and "status" (a string representing the store's status),
-    [0.0, 1.0] in factor of hours,
+    - store_poll_data_per_day (np.ndarray): A (7, 24) array of downsampled and filtered store poll data,
+    indexed by day of the week and hour of day, [0.0, 1.0] in factor of hours,
     """
 
-    store_poll_data_per_day = {
-        "0": [],
-        "1": [],
-        "2": [],
-        "3": [],
-        "4": [],
-        "5": [],
-        "6": [],
-    }
-    for day in range(0, 7):
-        store_poll_data_per_day[str(day)] = filter_status_by_business_hours(
-            store_poll_data[str(day)], business_hours[str(day)]
-        )
-        store_poll_data_per_day[str(day)] = sorted(
-            store_poll_data_per_day[str(day)], key=lambda x: x["timestamp_local"]
-        )
-        store_poll_data_per_day[str(day)] = downsampled_data(
-            store_poll_data_per_day[str(day)]
-        )
-
-    return store_poll_data_per_day
+    return downsampled_data(
+        filter_status_by_business_hours(store_poll_data, business_hours)
+    )
 
 
-def uptime_today(store_poll_data_per_day) -> tuple[float, float]:
+def uptime_today(
+    store_poll_data_per_day, last_weekday: int, last_hour: int
+) -> tuple[float, float]:
     """
     Calculates the uptime for the current day and the minutes of uptime for the last hour.
 
     Args:
-    - store_poll_data_per_day: a dictionary containing the polling data for each day of the week.
+    - store_poll_data_per_day: a (7, 24) array containing the polling data for each day of the week.
+    - last_weekday: the weekday (0-6) to report the day's uptime for.
+    - last_hour: the hour of day (0-23) to report the last hour's uptime for.
 
     Returns:
     A tuple containing two floats:
@@ -199,19 +248,10 @@ def uptime_today(store_poll_data_per_day) -> tuple[float, float]:
     - minutes_last_hour: the number of minutes of uptime for the last hour.
     """
 
-    last_weekday: int = datetime.now().weekday() - 1
-    last_hour: str = (datetime.now() - timedelta(hours=1)).strftime("%H:00:00")
+    day_data: np.ndarray = store_poll_data_per_day[last_weekday]
 
-    hours_today: float = 0.0
-    minutes_last_hour: float = 0.0
-
-    for day_data in store_poll_data_per_day[str(last_weekday)]:
-        hours_today += day_data["status"] if not math.isnan(day_data["status"]) else 0
-
-        if day_data["timestamp_local"] == last_hour:
-            minutes_last_hour = float(
-                day_data["status"] * 60 if not math.isnan(day_data["status"]) else 0
-            )
+    hours_today: float = float(np.nansum(day_data))
+    minutes_last_hour: float = float(np.nan_to_num(day_data[last_hour]) * 60)
 
     return hours_today, minutes_last_hour
 
@@ -221,21 +261,73 @@ def uptime_hours_this_week(store_poll_data_per_day) -> float:
     Calculates the total uptime hours for the current week based on the data in store_poll_data_per_day.
 
     Args:
-    - store_poll_data_per_day: a dictionary containing the store poll data for each day of the week
+    - store_poll_data_per_day: a (7, 24) array containing the store poll data for each day of the week
 
     Returns:
     - hours_this_week: a float representing the total uptime hours for the current week
     """
-    hours_this_week: float = 0.0
-    for weekday in range(0, 7):
-        for day_data in store_poll_data_per_day[str(weekday)]:
-            hours_this_week += (
-                day_data["status"] if not math.isnan(day_data["status"]) else 0
-            )
+    hours_this_week: float = float(np.nansum(store_poll_data_per_day))
 
     return hours_this_week
 
 
+def compute_store_report(
+    store_id: str,
+    store_poll_docs: list[dict],
+    store_menu_hours: list[dict],
+    tz: str,
+    last_weekday: int,
+    last_hour: int,
+) -> dict[str, Any]:
+    """
+    Computes the uptime/downtime statistics of a single store from its prefetched data.
+
+    Args:
+    - store_id: the ID of the store.
+    - store_poll_docs: the store's poll documents, sorted by timestamp_utc.
+    - store_menu_hours: the store's menu_hours documents.
+    - tz: the store's timezone string.
+    - last_weekday: the weekday (0-6) used for the last day's statistics.
+    - last_hour: the hour of day (0-23) used for the last hour's statistics.
+
+    Returns:
+    A dictionary with the keys described in generate_report.
+    """
+    current_result: dict[str, Any] = {
+        "store_id": store_id,
+        "uptime_last_hour": 0.0,
+        "downtime_last_hour": 60.0,
+        "uptime_last_day": 0.0,
+        "downtime_last_day": 24.0,
+        "uptime_last_week": 0.0,
+        "downtime_last_week": 168.0,
+    }
+
+    # DataFrame(index='timestamp_local', columns=['weekday', 'status'])
+    store_poll_data: pd.DataFrame = get_poll_data_of_store(store_poll_docs, tz)
+
+    # {'day':[{'start_time_local':"", 'start_time_local':""}]}
+    business_hours: dict[str, list] = get_business_hours_of_store(store_menu_hours)
+
+    store_poll_data_per_day: np.ndarray = get_store_poll_data_per_day(
+        store_poll_data, business_hours
+    )
+
+    (hours_today, minutes_last_hour) = uptime_today(
+        store_poll_data_per_day, last_weekday, last_hour
+    )
+
+    hours_this_week: float = uptime_hours_this_week(store_poll_data_per_day)
+
+    current_result["uptime_last_hour"] = minutes_last_hour
+    current_result["uptime_last_day"] = hours_today
+    current_result["uptime_last_week"] = hours_this_week
+    current_result["downtime_last_hour"] = 60 - current_result["uptime_last_hour"]
+    current_result["downtime_last_day"] = 24 - current_result["uptime_last_day"]
+    current_result["downtime_last_week"] = 168 - current_result["uptime_last_week"]
+    return current_result
+
+
 def generate_report() -> list:
     """
     Generates a report for all stores based on their uptime/downtime statistics for the last hour, day, and week.
@@ -250,53 +342,141 @@ def generate_report() -> list:
     - 'uptime_last_week': (float) The uptime of the store in hours for the last week.
     - 'downtime_last_week': (float) The downtime of the store in hours for the last week.
     """
-    result: list = []
-
-    for store_id in get_unique_store_ids_from_poll():
-        current_result: dict[str, Any] = {
-            "store_id": store_id,
-            "uptime_last_hour": 0.0,
-            "downtime_last_hour": 60.0,
-            "uptime_last_day": 0.0,
-            "downtime_last_day": 24.0,
-            "uptime_last_week": 0.0,
-            "downtime_last_week": 168.0,
-        }
+    now: datetime = datetime.now()
+    # Modulo keeps Monday's previous day at Sunday (6) instead of -1.
+    last_weekday: int = (now.weekday() - 1) % 7
+    last_hour: int = (now - timedelta(hours=1)).hour
+
+    # One scan per collection instead of several queries per store.
+    poll_data_by_store: dict[str, list] = get_poll_data_of_all_stores()
+    menu_hours_by_store: dict[str, list] = get_business_hours_of_all_stores()
+    timezone_by_store: dict[str, str] = get_timezones_of_all_stores()
+
+    # Stores are independent, so spread them over worker processes in batches.
+    result: list = Parallel(n_jobs=-1, backend="loky", batch_size=64)(
+        delayed(compute_store_report)(
+            store_id,
+            poll_data_by_store.get(store_id, []),
+            menu_hours_by_store.get(store_id, []),
+            timezone_by_store.get(store_id, "America/Chicago"),
+            last_weekday,
+            last_hour,
+        )
+        for store_id in get_unique_store_ids_from_poll()
+    )
 
-        # [{'timestamp_local:"", 'status':""}]
-        store_poll_data: dict[str, list] = get_poll_data_of_store(store_id)
+    return result
 
-        # {'day':[{'start_time_local':"", 'start_time_local':""}]}
-        business_hours: dict[str, list] = get_business_hours_of_store(store_id)
 
-        store_poll_data_per_day: dict[str, list] = get_store_poll_data_per_day(
-            store_poll_data, business_hours
-        )
+app: FastAPI = FastAPI()
 
-        (hours_today, minutes_last_hour) = uptime_today(store_poll_data_per_day)
 
-        hours_this_week: float = uptime_hours_this_week(store_poll_data_per_day)
+@app.on_event("startup")
+def create_indexes() -> None:
+    # Backs both the per-store timestamp range filter and the sort on it.
+    store_status_coll.create_index(
+        [("store_id", ASCENDING), ("timestamp_utc", ASCENDING)]
+    )
+    # Only the sentinel document has a sentinel_id, report documents are skipped.
+    reports_coll.create_index([("sentinel_id", ASCENDING)], unique=True, sparse=True)
+    reports_coll.update_one(
+        {"sentinel_id": 0}, {"$setOnInsert": {"status": "complete"}}, upsert=True
+    )
 
-        current_result["uptime_last_hour"] = minutes_last_hour
-        current_result["uptime_last_day"] = hours_today
-        current_result["uptime_last_week"] = hours_this_week
-        current_result["downtime_last_hour"] = 60 - current_result["uptime_last_hour"]
-        current_result["downtime_last_day"] = 24 - current_result["uptime_last_day"]
-        current_result["downtime_last_week"] = 168 - current_result["uptime_last_week"]
-        result.append(current_result)
 
-    return result
+def report_to_csv(report: list[dict]) -> bytes:
+    """
+    Serializes report rows to CSV with Arrow's columnar CSV writer.
 
+    Args:
+    - report: the list of per-store result dictionaries of a report.
 
-app: FastAPI = FastAPI()
+    Returns:
+    The CSV bytes, starting with the header row.
+    """
+    buffer = io.BytesIO()
+    # Values containing commas, quotes or newlines still get quoted.
+    pacsv.write_csv(
+        pa.Table.from_pylist(report),
+        buffer,
+        write_options=pacsv.WriteOptions(quoting_style="needed", quoting_header="none"),
+    )
+    return buffer.getvalue()
+
+
+def write_report_csv(report_id: str, report: list[dict]) -> Path:
+    reports_dir.mkdir(parents=True, exist_ok=True)
+    report_path: Path = reports_dir / f"{report_id}.csv"
+    csv_data: bytes = report_to_csv(report)
+    # Written to a temporary file and renamed over the target, so readers only
+    # ever see a complete CSV even when two requests rebuild it at once.
+    tmp_file = tempfile.NamedTemporaryFile(
+        dir=reports_dir, prefix=f"{report_id}.", suffix=".tmp", delete=False
+    )
+    try:
+        with tmp_file:
+            tmp_file.write(csv_data)
+        os.replace(tmp_file.name, report_path)
+    except Exception:
+        os.unlink(tmp_file.name)
+        raise
+    return report_path
+
+
+def run_report(report_id: str) -> None:
+    try:
+        report: list = generate_report()
+        # Written before the report is marked complete so /get-report can serve it.
+        write_report_csv(report_id, report)
+        reports_coll.insert_one(
+            {"report_id": report_id, "report": report, "report_status": "complete"}
+        )
+    except Exception:
+        # Recorded so /get-report can tell a failed run from an unknown id.
+        reports_coll.insert_one({"report_id": report_id, "report_status": "failed"})
+        raise
+    finally:
+        # Only release our own claim, a timed out run may have been taken over.
+        reports_coll.update_one(
+            {"sentinel_id": 0, "report_id": report_id},
+            {"$set": {"status": "complete"}},
+        )
 
 
 @app.get("/trigger-report")
-def trigger_report() -> JSONResponse:
-    running_doc: Any | None = reports_coll.find_one(
-        {"sentinel_id": 0, "status": "running"}
+def trigger_report(background_tasks: BackgroundTasks) -> JSONResponse:
+    # Claim the sentinel atomically, only one request can flip it to running.
+    report_id: str = str(uuid.uuid4())
+    now: datetime = datetime.utcnow()
+    sentinel = reports_coll.update_one(
+        {
+            "sentinel_id": 0,
+            "$or": [
+                {"status": "complete"},
+                # Also matches running sentinels written without a started_at.
+                {
+                    "status": "running",
+                    "started_at": {"$not": {"$gte": now - report_timeout}},
+                },
+            ],
+        },
+        {
+            "$set": {"status": "running", "report_id": report_id, "started_at": now},
+        },
     )
-    if running_doc:
+    if sentinel.matched_count == 0:
+        running_doc: Any | None = reports_coll.find_one({"sentinel_id": 0})
+        if running_doc is None:
+            return JSONResponse(
+                content={"message": "report sentinel missing"}, status_code=500
+            )
+        if running_doc["status"] != "running":
+            # The other run finished after our claim failed, ask for a retry.
+            response_body: dict[str, str] = {
+                "message": "Complete, retry to start a new report",
+                "report_id": running_doc["report_id"],
+            }
+            return JSONResponse(content=response_body, status_code=409)
         response_body: dict[str, str] = {
             "message": "Running",
             "report_id": running_doc["report_id"],
@@ -304,25 +484,12 @@ def trigger_report() -> JSONResponse:
         return JSONResponse(content=response_body, status_code=400)
 
     # Report generation
-    report_id: str = str(uuid.uuid4())
-    reports_coll.update_one(
-        {"sentinel_id": 0, "status": "complete"},
-        {
-            "$set": {"status": "running", "report_id": report_id},
-        },
-    )
-
-    report: list = generate_report()
-    reports_coll.insert_one(
-        {"report_id": report_id, "report": report, "report_status": "complete"}
-    )
+    background_tasks.add_task(run_report, report_id)
     response_body: dict[str, str] = {
-        "message": "Complete",
+        "message": "Running",
         "report_id": report_id,
     }
 
-    reports_coll.update_one({"sentinel_id": 0}, {"$set": {"status": "complete"}})
-
     return JSONResponse(content=response_body, status_code=200)
 
 
@@ -331,29 +498,63 @@ class ReportRequest(BaseModel):
 
 
 @app.post("/get-report")
-def get_report(report_request: ReportRequest, response: Response) -> JSONResponse:
+def get_report(report_request: ReportRequest) -> Response:
+    # Only the requested report can be running, other reports stay readable.
     running_doc: Any | None = reports_coll.find_one(
-        {"sentinel_id": 0, "status": "running"}
+        {
+            "sentinel_id": 0,
+            "status": "running",
+            "report_id": report_request.report_id,
+        }
     )
 
     completed_report: Any | None = reports_coll.find_one(
-        {"report_id": report_request.report_id, "report_status": "complete"}
+        {
+            "report_id": report_request.report_id,
+            "report_status": {"$in": ["complete", "failed"]},
+        },
+        projection={"_id": False, "report_id": True, "report_status": True},
     )
 
-    if running_doc:
+    # A finished run is served even before its claim on the sentinel is released.
+    if running_doc and not completed_report:
+        started_at: datetime | None = running_doc.get("started_at")
+        if started_at is None or started_at < datetime.utcnow() - report_timeout:
+            # Same rule /trigger-report uses to reclaim a crashed run.
+            return JSONResponse(
+                content={"message": "Failed", "report_id": report_request.report_id},
+                status_code=500,
+            )
         return JSONResponse(
-            content={"message": "Running", "report_id": running_doc["report_id"]},
+            content={"message": "Running", "report_id": report_request.report_id},
             status_code=400,
         )
 
+    if completed_report and completed_report["report_status"] == "failed":
+        return JSONResponse(
+            content={"message": "Failed", "report_id": report_request.report_id},
+            status_code=500,
+        )
+
     if completed_report:
-        cursor = reports_coll.find({"report_id": report_request.report_id})
-
-        data = list(cursor)
-        data = pd.DataFrame(data[0]["report"])
-        csv_data: str = data.to_csv(index=False)
-        response.headers["Content-Disposition"] = "attachment; filename=data.csv"
-        response.headers["Content-Type"] = "text/csv"
-        return JSONResponse(content=csv_data, status_code=200)
+        report_path: Path = reports_dir / f"{completed_report['report_id']}.csv"
+        if not report_path.exists():
+            # Reports generated before their CSV was written to disk. Filtered on
+            # report_status, the sentinel carries the newest report_id too.
+            report_doc: Any | None = reports_coll.find_one(
+                {
+                    "report_id": completed_report["report_id"],
+                    "report_status": "complete",
+                },
+                projection={"_id": False, "report": True},
+            )
+            if report_doc is None or "report" not in report_doc:
+                return JSONResponse(
+                    content={"message": "invalid report id"}, status_code=404
+                )
+            report_path = write_report_csv(
+                completed_report["report_id"], report_doc["report"]
+            )
+        return FileResponse(report_path, media_type="text/csv", filename="data.csv")
 
     return JSONResponse(content={"message": "invalid report id"}, status_code=404)